@@ -28,8 +28,9 @@ Originally in daliuge/daliuge-engine/apps/plasmaflight.py
 
 import logging
 from io import BytesIO
-from typing import Optional
+from typing import Optional, Union
 
+import pyarrow
 import pyarrow.flight as paf
 import pyarrow.plasma as plasma
 
@@ -97,8 +98,10 @@ class PlasmaFlightClient:
         """Seals the plasma buffer marking it as readonly"""
         self.plasma_client.seal(object_id)
 
-    def put_raw_buffer(self, data: memoryview, object_id: plasma.ObjectID):
-        """Puts"""
+    def put_raw_buffer(
+        self, data: Union[memoryview, pyarrow.Buffer], object_id: plasma.ObjectID
+    ):
+        """Puts a raw buffer into the local plasma store and seals it"""
         self.plasma_client.put_raw_buffer(data, object_id)
 
     def get_buffer(
@@ -26,18 +26,16 @@ Plasma IO and PlasmaDrops implementation
 Originally in daliuge/daliuge-engine/data/drops/plasma.py
 """
 
-import binascii
-import io
+import hashlib
+import hmac
 import logging
 import os
-from typing import Optional
+from typing import Iterable, Optional
 
-import numpy as np
 import pyarrow
 from dlg.data.drops.data_base import DataDROP
 from dlg.data.io import DataIO
 from dlg.meta import dlg_bool_param, dlg_string_param
-from overrides import overrides
 from pyarrow import plasma as plasma
 
 from daliuge_plasma_components.apps import PlasmaFlightClient
@@ -71,8 +69,10 @@ class PlasmaIO(DataIO):
         super().__init__()
         self._plasma_path = plasma_path
         self._object_id = object_id
-        self._reader = None
-        self._writer = io.BytesIO()
+        self._read_offset = 0
+        self._writer: Optional[pyarrow.NativeFile] = None
+        self._sealed = False
+        self._buffer_ref: Optional[pyarrow.Buffer] = None
         # treat sizes <1 as None
         self._expected_size = (
             expected_size if expected_size and expected_size > 0 else None
@@ -80,35 +80,41 @@ class PlasmaIO(DataIO):
         self._buffer_size = 0
         self._use_staging = use_staging
 
-    @overrides
     def _open(self, **kwargs):
         return plasma.connect(self._plasma_path)
 
-    @overrides
     def _close(self, **kwargs):
-        if self._writer:
-            if self._use_staging:
-                self._desc.put_raw_buffer(self._writer.getbuffer(), self._object_id)
-                self._writer.close()
+        if self._writer is not None:
+            if isinstance(self._writer, pyarrow.BufferOutputStream):
+                # getvalue() finishes the stream and returns a view of its buffer
+                self._desc.put_raw_buffer(self._writer.getvalue(), self._object_id)
             else:
                 self._desc.seal(self._object_id)
                 self._writer.close()
-        if self._reader:
-            self._reader.close()
+        self._read_offset = 0
+        self._buffer_ref = None
 
-    def _read(self, count, **kwargs):
-        if not self._reader:
-            [data] = self._desc.get_buffers([self._object_id])
-            self._reader = pyarrow.BufferReader(data)
-        return self._reader.read1(count)
+    def _read(self, count, **kwargs) -> memoryview:
+        view = self.read_slice(self._read_offset, count)
+        self._read_offset += view.nbytes
+        return view
+
+    def read_slice(self, offset: int, count: int) -> memoryview:
+        """
+        Returns a zero-copy view of up to count bytes of the plasma buffer from offset.
+        """
+        end = offset + count
+        return self.buffer()[offset:end]
 
-    @overrides
     def _write(self, data, **kwargs) -> int:
         """
         Writes data into the PlasmaIO reserved buffer.
+        If expected_size is > 0, multiple writes up to expected_size are written directly
+        into the plasma buffer, regardless of use_staging.
         If use_staging is False and expected_size is None, only a single write is allowed.
-        If use_staging is False and expected_size is > 0, multiple writes up to expected_size is allowed.
-        If use_staging is True, any number of writes may occur with a small performance penalty.
+        If use_staging is True and expected_size is None, any number of writes may occur
+        into a resizable arrow buffer that is copied into plasma on close.
+        A total_size keyword sizes the plasma buffer allocated by the first write.
         """
         # NOTE: data must be a collection of bytes for len to represent the buffer bytesize
         # assert isinstance(
@@ -116,43 +122,110 @@ class PlasmaIO(DataIO):
         # )
         databytes = data.nbytes if isinstance(data, memoryview) else len(data)
 
-        if not self._use_staging:
+        writer = self._writer
+        if writer is None:
+            if not self._use_staging and databytes == self._expected_size:
+                # the whole payload arrives in one write, create and seal it at once
+                self._write_once(data)
+                return len(data)
+            writer = self._open_writer(kwargs.get("total_size", databytes))
+
+        if isinstance(writer, pyarrow.BufferOutputStream):
+            writer.write(data)
+            self._buffer_size = writer.tell()
+            return len(data)
+
+        self._check_capacity(writer, databytes)
+        writer.write(data)
+        return len(data)
+
+    def writev(self, bufs: Iterable) -> int:
+        """
+        Writes a sequence of buffers with a single plasma allocation.
+        If use_staging is False and expected_size is None, the plasma buffer is sized to
+        the total of all buffers.
+        """
+        views = [memoryview(buf) for buf in bufs]
+        total = sum(view.nbytes for view in views)
+        return sum(self.write(view, total_size=total) for view in views)
+
+    def _write_once(self, data):
+        """Creates and seals the plasma object from a single complete payload"""
+        if isinstance(data, bytes):
+            self._raise_if_sealed()
+            self._desc.create_and_seal(self._object_id, data)
+            self._buffer_size = len(data)
+            self._sealed = True
+        else:
+            self.write_zero_copy(data)
+
+    def _open_writer(self, databytes: int) -> pyarrow.NativeFile:
+        self._raise_if_sealed()
+        if self._expected_size is not None or not self._use_staging:
             # write directly into fixed size plasma buffer
             self._buffer_size = (
                 self._expected_size if self._expected_size is not None else databytes
             )
             plasma_buffer = self._desc.create(self._object_id, self._buffer_size)
             self._writer = pyarrow.FixedSizeBufferWriter(plasma_buffer)
-        if self._writer.tell() + databytes > self._buffer_size:
+        else:
+            # stream into resizeable buffer
+            logger.warning(
+                "Using dynamically sized Plasma buffer. Performance may be reduced."
+            )
+            self._writer = pyarrow.BufferOutputStream()
+        return self._writer
+
+    def _raise_if_sealed(self):
+        if self._sealed:
+            raise IOError(
+                f"attempted to write to sealed plasma buffer of size {self._buffer_size}"
+            )
+
+    def _check_capacity(self, writer: pyarrow.NativeFile, databytes: int):
+        if writer.tell() + databytes > self._buffer_size:
             raise IOError(
                 "".join(
                     [
-                        f"attempted to write {self._writer.tell() + databytes} ",
+                        f"attempted to write {writer.tell() + databytes} ",
                         f"bytes to plasma buffer of size {self._buffer_size}, ",
                         "consider using staging or expected_size argument",
                     ]
                 )
             )
 
-        self._writer.write(data)
-        return len(data)
+    def write_zero_copy(self, data: memoryview) -> int:
+        """
+        Writes and seals the full payload in a single pass when the caller already
+        holds all of the data, bypassing any staging buffer.
+        """
+        if self._writer is not None:
+            raise IOError("write_zero_copy requires an unwritten plasma buffer")
+        self._raise_if_sealed()
+        data = memoryview(data)
+        self._buffer_size = data.nbytes
+        plasma_buffer = self._desc.create(self._object_id, self._buffer_size)
+        pyarrow.FixedSizeBufferWriter(plasma_buffer).write(data)
+        self._desc.seal(self._object_id)
+        self._sealed = True
+        return self._buffer_size
 
-    @overrides
     def _size(self, **kwargs) -> int:
         return self._buffer_size
 
-    @overrides
     def exists(self) -> bool:
-        return self._object_id in self._desc.list()
+        return self._desc.contains(self._object_id)
 
-    @overrides
     def delete(self):
+        self._buffer_ref = None
         self._desc.delete([self._object_id])
 
-    @overrides
     def buffer(self) -> memoryview:
-        [data] = self._desc.get_buffers([self._object_id])
-        return memoryview(data)
+        if self._buffer_ref is None:
+            [self._buffer_ref] = self._desc.get_buffers([self._object_id])
+        # the view exports the plasma buffer without copying and holds a
+        # reference to it for as long as the view is alive
+        return memoryview(self._buffer_ref)
 
 
 class PlasmaFlightIO(DataIO):
@@ -175,7 +248,8 @@ class PlasmaFlightIO(DataIO):
         self._plasma_path = plasma_path
         self._flight_path = flight_path
         self._reader = None
-        self._writer = io.BytesIO()
+        self._writer: Optional[pyarrow.NativeFile] = None
+        self._buffer_ref: Optional[memoryview] = None
         # treat sizes <1 as None
         self._expected_size = (
             expected_size if expected_size and expected_size > 0 else None
@@ -187,10 +261,10 @@ class PlasmaFlightIO(DataIO):
         return PlasmaFlightClient(socket=self._plasma_path)
 
     def _close(self, **kwargs):
-        if self._writer:
+        if self._writer is not None:
             if self._use_staging:
-                self._desc.put_raw_buffer(self._writer.getbuffer(), self._object_id)
-                self._writer.close()
+                # getvalue() finishes the stream and returns a view of its buffer
+                self._desc.put_raw_buffer(self._writer.getvalue(), self._object_id)
             else:
                 if self._expected_size != self._writer.tell():
                     logger.debug(
@@ -199,11 +273,11 @@ class PlasmaFlightIO(DataIO):
                 self._desc.seal(self._object_id)
         if self._reader:
             self._reader.close()
+        self._buffer_ref = None
 
     def _read(self, count, **kwargs):
         if not self._reader:
-            data = self._desc.get_buffer(self._object_id, self._flight_path)
-            self._reader = pyarrow.BufferReader(data)
+            self._reader = pyarrow.BufferReader(self.buffer())
         return self._reader.read1(count)
 
     def _write(self, data, **kwargs) -> int:
@@ -213,36 +287,119 @@ class PlasmaFlightIO(DataIO):
         #     data, Union[memoryview, bytes, bytearray, pyarrow.Buffer].__args__
         # )
         databytes = data.nbytes if isinstance(data, memoryview) else len(data)
+        writer = self._writer
+        if writer is None:
+            if self._use_staging:
+                # stream into resizeable buffer
+                logger.warning(
+                    "Using dynamically sized Plasma buffer. Performance may be reduced."
+                )
+                writer = pyarrow.BufferOutputStream()
+            else:
+                # write directly to fixed size plasma buffer
+                self._buffer_size = (
+                    self._expected_size
+                    if self._expected_size is not None
+                    else kwargs.get("total_size", databytes)
+                )
+                plasma_buffer = self._desc.create(self._object_id, self._buffer_size)
+                writer = pyarrow.FixedSizeBufferWriter(plasma_buffer)
+            self._writer = writer
+        writer.write(data)
         if self._use_staging:
-            # stream into resizeable buffer
-            logger.warning(
-                "Using dynamically sized Plasma buffer. Performance may be reduced."
-            )
-        else:
-            # write directly to fixed size plasma buffer
-            self._buffer_size = (
-                self._expected_size if self._expected_size is not None else databytes
-            )
-            plasma_buffer = self._desc.create(self._object_id, self._buffer_size)
-            self._writer = pyarrow.FixedSizeBufferWriter(plasma_buffer)
-        self._writer.write(data)
+            self._buffer_size = writer.tell()
         return len(data)
 
-    @overrides
+    def writev(self, bufs: Iterable) -> int:
+        """
+        Writes a sequence of buffers with a single plasma allocation.
+        """
+        views = [memoryview(buf) for buf in bufs]
+        total = sum(view.nbytes for view in views)
+        return sum(self.write(view, total_size=total) for view in views)
+
     def exists(self) -> bool:
         return self._desc.exists(self._object_id, self._flight_path)
 
-    @overrides
     def _size(self, **kwargs) -> int:
         return self._buffer_size
 
-    @overrides
     def delete(self):
-        pass
+        self._buffer_ref = None
 
-    @overrides
     def buffer(self) -> memoryview:
-        return self._desc.get_buffer(self._object_id, self._flight_path)
+        if self._buffer_ref is None:
+            self._buffer_ref = self._desc.get_buffer(self._object_id, self._flight_path)
+        return self._buffer_ref
+
+    def export_c_data_interface(self, array_ptr: int, schema_ptr: int):
+        """
+        Exports the plasma buffer without copying as a single element arrow binary
+        array through the Arrow C Data Interface, for import by non-Python runtimes.
+
+        Args:
+            array_ptr (int): address of a caller owned ArrowArray struct to fill
+            schema_ptr (int): address of a caller owned ArrowSchema struct to fill
+        The exported array references the plasma buffer until its release callback is
+        called by the consumer, as with pyarrow.Array._export_to_c.
+        """
+        data = pyarrow.py_buffer(self.buffer())
+        if data.size < 2**31:
+            binary_type, offset_type = pyarrow.binary(), pyarrow.int32()
+        else:
+            binary_type, offset_type = pyarrow.large_binary(), pyarrow.int64()
+        offsets = pyarrow.array([0, data.size], type=offset_type).buffers()[1]
+        array = pyarrow.Array.from_buffers(binary_type, 1, [None, offsets, data])
+        array._export_to_c(array_ptr, schema_ptr)
+
+
+def _derive_object_id(uid: str, session_id: Optional[str] = None) -> bytes:
+    """
+    Derives a 20 byte plasma object id for a drop uid. Within a session the id is
+    a digest of the uid keyed on the session id, so any process that knows both
+    can compute it. Without a session the same uid may be created more than once
+    against one store, so a random id is used instead.
+    """
+    if session_id:
+        return hmac.new(
+            session_id.encode("utf-8"), uid.encode("utf-8"), hashlib.sha1
+        ).digest()
+    return os.urandom(20)
+
+
+class _PlasmaDataDROP(DataDROP):
+    """
+    Write behaviour shared by the plasma drops
+    """
+
+    _write_size_hint: Optional[int] = None
+
+    def writeAll(self, bufs: Iterable) -> int:
+        """
+        Writes a sequence of buffers through write(), returning the total number of
+        bytes written or the first DataDROPError returned by write().
+        """
+        bufs = list(bufs)
+        unsized = not self._wio and self._expectedSize <= 0 and not self.use_staging
+        if unsized and all(isinstance(buf, (bytes, memoryview)) for buf in bufs):
+            # size the single plasma buffer opened by the first write to fit every buffer
+            self._write_size_hint = sum(memoryview(buf).nbytes for buf in bufs)
+        try:
+            total = 0
+            for buf in bufs:
+                nbytes = self.write(buf)
+                if nbytes < 0:
+                    return nbytes
+                total += nbytes
+            return total
+        finally:
+            self._write_size_hint = None
+
+    @property
+    def _io_expected_size(self) -> int:
+        if self._write_size_hint is not None:
+            return self._write_size_hint
+        return self._expectedSize
 
 
 ##
@@ -259,7 +416,7 @@ class PlasmaFlightIO(DataIO):
 # @param use_staging False/Boolean/ComponentParameter/NoPort/ReadWrite//False/False/Enables writing to a dynamically resizeable staging buffer
 # @param dummy /Object/ApplicationArgument/InputOutput/ReadWrite//False/False/Dummy port
 # @par EAGLE_END
-class PlasmaDROP(DataDROP):
+class PlasmaDROP(_PlasmaDataDROP):
     """
     A DROP that points to data stored in a Plasma Store
     """
@@ -272,23 +429,22 @@ class PlasmaDROP(DataDROP):
         super().initialize(**kwargs)
         self.plasma_path = os.path.expandvars(self.plasma_path)
         if self.object_id is None:
-            self.object_id = (
-                np.random.bytes(20) if len(self.uid) != 20 else self.uid.encode("ascii")
-            )
+            self.object_id = _derive_object_id(self.uid, self.dlg_session_id)
         elif isinstance(self.object_id, str):
             self.object_id = self.object_id.encode("ascii")
+        self._data_url = "plasma://" + self.object_id.hex()
 
     def getIO(self):
         return PlasmaIO(
             plasma.ObjectID(self.object_id),
             self.plasma_path,
-            expected_size=self._expectedSize,
+            expected_size=self._io_expected_size,
             use_staging=self.use_staging,
         )
 
     @property
     def dataURL(self) -> str:
-        return "plasma://%s" % (binascii.hexlify(self.object_id).decode("ascii"))
+        return self._data_url
 
 
 ##
@@ -306,7 +462,7 @@ class PlasmaDROP(DataDROP):
 # @param flight_path /String/ComponentParameter/NoPort/ReadWrite//False/False/IP and flight port of the drop owner
 # @param dummy /Object/ApplicationArgument/InputOutput/ReadWrite//False/False/Dummy port
 # @par EAGLE_END
-class PlasmaFlightDROP(DataDROP):
+class PlasmaFlightDROP(_PlasmaDataDROP):
     """
     A DROP that points to data stored in a Plasma Store
     """
@@ -320,21 +476,20 @@ class PlasmaFlightDROP(DataDROP):
         super().initialize(**kwargs)
         self.plasma_path = os.path.expandvars(self.plasma_path)
         if self.object_id is None:
-            self.object_id = (
-                np.random.bytes(20) if len(self.uid) != 20 else self.uid.encode("ascii")
-            )
+            self.object_id = _derive_object_id(self.uid, self.dlg_session_id)
         elif isinstance(self.object_id, str):
             self.object_id = self.object_id.encode("ascii")
+        self._data_url = "plasmaflight://" + self.object_id.hex()
 
     def getIO(self):
         return PlasmaFlightIO(
             plasma.ObjectID(self.object_id),
             self.plasma_path,
             flight_path=self.flight_path,
-            expected_size=self._expectedSize,
+            expected_size=self._io_expected_size,
             use_staging=self.use_staging,
         )
 
     @property
     def dataURL(self) -> str:
-        return "plasmaflight://%s" % (binascii.hexlify(self.object_id).decode("ascii"))
+        return self._data_url
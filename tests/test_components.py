@@ -32,11 +32,25 @@ from dlg.droputils import DROPWaiterCtx, allDropContents
 
 from crc32c import crc32c
 from dlg.ddap_protocol import DROPStates
+from dlg.data.drops.data_base import DataDROPError
 from dlg.data.drops.memory import InMemoryDROP
 
 import subprocess
+import tempfile
+from unittest import mock
 
-from daliuge_plasma_components.data import PlasmaDROP, PlasmaFlightDROP
+import numpy as np
+import pyarrow
+from dlg.data.io import OpenMode
+from pyarrow import plasma
+
+from daliuge_plasma_components.data import (
+    PlasmaDROP,
+    PlasmaFlightDROP,
+    PlasmaFlightIO,
+    PlasmaIO,
+    _derive_object_id,
+)
 
 
 class SumupContainerChecksum(BarrierAppDROP):
@@ -52,11 +66,16 @@ class SumupContainerChecksum(BarrierAppDROP):
     """
 
     def run(self):
-        crcSum = 0
-        for inputDrop in self.inputs:
-            if inputDrop.status == DROPStates.COMPLETED:
-                if inputDrop.checksum:
-                    crcSum += inputDrop.checksum
+        inputs = self.inputs
+        states = np.fromiter(
+            (inputDrop.status for inputDrop in inputs), dtype=np.int32, count=len(inputs)
+        )
+        checksums = np.fromiter(
+            (inputDrop.checksum or 0 for inputDrop in inputs),
+            dtype=np.int64,
+            count=len(inputs),
+        )
+        crcSum = int(checksums[states == DROPStates.COMPLETED].sum())
         outputDrop = self.outputs[0]
         outputDrop.write(str(crcSum).encode("utf8"))
 
@@ -79,7 +98,14 @@ class TestDROP(unittest.TestCase):
         self._test_drop_sz = 16  # MB
         self._test_block_sz = 2  # MB
         self._test_num_blocks = self._test_drop_sz // self._test_block_sz
-        self._test_block = os.urandom(self._test_block_sz * 1024**2)
+        # retain the numpy array backing the shared zero-copy block view
+        self._test_np = np.frombuffer(
+            os.urandom(self._test_block_sz * 1024**2), dtype=np.uint8
+        )
+        self._test_block = memoryview(self._test_np)
+        self._reference_crc = 0
+        for _ in range(self._test_num_blocks):
+            self._reference_crc = crc32c(self._test_block, self._reference_crc)
 
     def _test_write_withDropType(self, dropType):
         """
@@ -91,18 +117,49 @@ class TestDROP(unittest.TestCase):
         b.addInput(a)
         b.addOutput(c)
 
-        test_crc = 0
         with DROPWaiterCtx(self, c):
             for _ in range(self._test_num_blocks):
                 a.write(self._test_block)
-                test_crc = crc32c(self._test_block, test_crc)
 
         # Read the checksum from c
         cChecksum = int(allDropContents(c))
 
         self.assertNotEqual(a.checksum, 0)
-        self.assertEqual(a.checksum, test_crc)
-        self.assertEqual(cChecksum, test_crc)
+        self.assertEqual(a.checksum, self._reference_crc)
+        self.assertEqual(cChecksum, self._reference_crc)
+
+    def _test_writeAll_withDropType(self, dropType):
+        """
+        Test writing all blocks of an AbstractDROP in a single writeAll call
+        """
+        a = dropType("oid:A", "uid:A", expectedSize=self._test_drop_sz * 1024**2)
+        b = SumupContainerChecksum("oid:B", "uid:B")
+        c = InMemoryDROP("oid:C", "uid:C")
+        b.addInput(a)
+        b.addOutput(c)
+
+        with DROPWaiterCtx(self, c):
+            nbytes = a.writeAll([self._test_block] * self._test_num_blocks)
+
+        # Read the checksum from c
+        cChecksum = int(allDropContents(c))
+
+        self.assertEqual(nbytes, self._test_drop_sz * 1024**2)
+        self.assertEqual(a.checksum, self._reference_crc)
+        self.assertEqual(cChecksum, self._reference_crc)
+        self.assertEqual(
+            a.writeAll([self._test_block]), DataDROPError.INCORRECT_DROP_STATE
+        )
+
+    def _test_unsized_writeAll_withDropType(self, dropType):
+        """
+        Test writing several blocks with writeAll into an AbstractDROP without an
+        expected drop size
+        """
+        a = dropType("oid:A", "uid:A")
+        self.assertEqual(a.writeAll([b"0123", memoryview(b"4567")]), 8)
+        a.setCompleted()
+        self.assertEqual(allDropContents(a), b"01234567")
 
     def _test_dynamic_write_withDropType(self, dropType):
         """
@@ -117,19 +174,17 @@ class TestDROP(unittest.TestCase):
         b.addInput(a)
         b.addOutput(c)
 
-        test_crc = 0
         with DROPWaiterCtx(self, c):
             for _ in range(self._test_num_blocks):
                 a.write(self._test_block)
-                test_crc = crc32c(self._test_block, test_crc)
             a.setCompleted()
 
         # Read the checksum from c
         cChecksum = int(allDropContents(c))
 
         self.assertNotEqual(a.checksum, 0)
-        self.assertEqual(a.checksum, test_crc)
-        self.assertEqual(cChecksum, test_crc)
+        self.assertEqual(a.checksum, self._reference_crc)
+        self.assertEqual(cChecksum, self._reference_crc)
 
     def test_write_plasmaDROP(self):
         """
@@ -147,6 +202,38 @@ class TestDROP(unittest.TestCase):
             if store:
                 store.terminate()
 
+    def test_writeAll_plasmaDROP(self):
+        """
+        Test an PlasmaDrop written with writeAll
+        """
+        store = None
+        try:
+            store = subprocess.Popen(
+                ["plasma_store", "-m", "100000000", "-s", "/tmp/plasma"]
+            )
+            self._test_writeAll_withDropType(PlasmaDROP)
+        except FileNotFoundError:
+            logging.info(f"plasma_store not found when running test.")
+        finally:
+            if store:
+                store.terminate()
+
+    def test_unsized_writeAll_plasmaDROP(self):
+        """
+        Test an PlasmaDrop written with writeAll without an expected size
+        """
+        store = None
+        try:
+            store = subprocess.Popen(
+                ["plasma_store", "-m", "100000000", "-s", "/tmp/plasma"]
+            )
+            self._test_unsized_writeAll_withDropType(PlasmaDROP)
+        except FileNotFoundError:
+            logging.info(f"plasma_store not found when running test.")
+        finally:
+            if store:
+                store.terminate()
+
     def test_dynamic_write_plasmaDROP(self):
         """
         Test an PlasmaDrop and a simple AppDROP (for checksum calculation)
@@ -179,6 +266,38 @@ class TestDROP(unittest.TestCase):
             if store:
                 store.terminate()
 
+    def test_writeAll_plasmaFlightDROP(self):
+        """
+        Test an PlasmaFlightDrop written with writeAll
+        """
+        store = None
+        try:
+            store = subprocess.Popen(
+                ["plasma_store", "-m", "100000000", "-s", "/tmp/plasma"]
+            )
+            self._test_writeAll_withDropType(PlasmaFlightDROP)
+        except FileNotFoundError:
+            logging.info(f"plasma_store not found when running test.")
+        finally:
+            if store:
+                store.terminate()
+
+    def test_unsized_writeAll_plasmaFlightDROP(self):
+        """
+        Test an PlasmaFlightDrop written with writeAll without an expected size
+        """
+        store = None
+        try:
+            store = subprocess.Popen(
+                ["plasma_store", "-m", "100000000", "-s", "/tmp/plasma"]
+            )
+            self._test_unsized_writeAll_withDropType(PlasmaFlightDROP)
+        except FileNotFoundError:
+            logging.info(f"plasma_store not found when running test.")
+        finally:
+            if store:
+                store.terminate()
+
     def test_dynamic_write_plasmaFlightDROP(self):
         """
         Test an PlasmaDrop and a simple AppDROP (for checksum calculation)
@@ -194,3 +313,213 @@ class TestDROP(unittest.TestCase):
         finally:
             if store:
                 store.terminate()
+
+
+class TestObjectId(unittest.TestCase):
+    """
+    Tests plasma object id derivation from drop uids
+    """
+
+    def test_derive_object_id_per_session(self):
+        session_a = _derive_object_id("uid:A", "session-a")
+        self.assertEqual(len(session_a), 20)
+        self.assertEqual(session_a, _derive_object_id("uid:A", "session-a"))
+        self.assertNotEqual(session_a, _derive_object_id("uid:B", "session-a"))
+        self.assertNotEqual(session_a, _derive_object_id("uid:A", "session-b"))
+
+    def test_derive_object_id_without_session(self):
+        # the same uid may be created twice against one store outside a session
+        object_id = _derive_object_id("uid:A")
+        self.assertEqual(len(object_id), 20)
+        self.assertNotEqual(object_id, _derive_object_id("uid:A"))
+        self.assertNotEqual(object_id, _derive_object_id("uid:A", ""))
+
+    def test_drop_object_id(self):
+        for dropType in (PlasmaDROP, PlasmaFlightDROP):
+            a = dropType("oid:A", "uid:A", dlg_session_id="session-a")
+            self.assertEqual(a.object_id, _derive_object_id("uid:A", "session-a"))
+            # ids are valid plasma object ids
+            plasma.ObjectID(a.object_id)
+            # without a session every drop gets its own object
+            self.assertNotEqual(
+                dropType("oid:A", "uid:A").object_id, dropType("oid:A", "uid:A").object_id
+            )
+
+
+class TestPlasmaIO(unittest.TestCase):
+    """
+    Tests the plasma IO classes against a private plasma store
+    """
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._plasma_path = os.path.join(self._tmpdir.name, "plasma")
+        try:
+            self._store = subprocess.Popen(
+                ["plasma_store", "-m", "100000000", "-s", self._plasma_path]
+            )
+        except FileNotFoundError:
+            self._tmpdir.cleanup()
+            self.skipTest("plasma_store not found when running test.")
+        self._client = plasma.connect(self._plasma_path)
+
+    def tearDown(self):
+        self._client.disconnect()
+        self._store.terminate()
+        self._store.wait()
+        self._tmpdir.cleanup()
+
+    def _put(self, data: bytes) -> plasma.ObjectID:
+        object_id = plasma.ObjectID.from_random()
+        self._client.put_raw_buffer(data, object_id)
+        return object_id
+
+    def _read_all(self, object_id: plasma.ObjectID) -> bytes:
+        [data] = self._client.get_buffers([object_id])
+        return data.to_pybytes()
+
+    def test_delete(self):
+        object_id = self._put(b"0123456789")
+        io = PlasmaIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_READ)
+        self.assertTrue(io.exists())
+        io.delete()
+        # the delete is visible to other clients once delete() returns
+        self.assertFalse(io.exists())
+        self.assertFalse(self._client.contains(object_id))
+        io.close()
+
+    def test_buffer_reused_until_close(self):
+        object_id = self._put(b"0123456789")
+        io = PlasmaIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_READ)
+        view = io.buffer()
+        self.assertEqual(view.tobytes(), b"0123456789")
+        self.assertIs(io.buffer().obj, view.obj)
+        del view
+        io.close()
+        # no plasma reference outlives the closed IO, so the store can delete it
+        self._client.delete([object_id])
+        self.assertFalse(self._client.contains(object_id))
+
+    def test_writev(self):
+        for io_class in (PlasmaIO, PlasmaFlightIO):
+            object_id = plasma.ObjectID.from_random()
+            # no expected size, so the single allocation must cover every buffer
+            io = io_class(object_id, self._plasma_path)
+            io.open(OpenMode.OPEN_WRITE)
+            self.assertEqual(io.writev([b"0123", memoryview(b"456789")]), 10)
+            io.close()
+            self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_writev_requires_write_mode(self):
+        object_id = self._put(b"0123456789")
+        io = PlasmaIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_READ)
+        with self.assertRaises(ValueError):
+            io.writev([b"0123"])
+        io.close()
+
+    def test_write_zero_copy(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_WRITE)
+        self.assertEqual(io.write_zero_copy(memoryview(b"0123456789")), 10)
+        # sealed without waiting for close
+        self.assertTrue(self._client.contains(object_id))
+        with self.assertRaises(IOError):
+            io.write(b"0123")
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_write_expected_size_once(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaIO(object_id, self._plasma_path, expected_size=10)
+        io.open(OpenMode.OPEN_WRITE)
+        self.assertEqual(io.write(b"0123456789"), 10)
+        # created and sealed by the write itself, so close() has nothing to do
+        self.assertTrue(self._client.contains(object_id))
+        self.assertIsNone(io._writer)
+        with self.assertRaises(IOError):
+            io.write(b"0123")
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_write_expected_size_once_memoryview(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaIO(object_id, self._plasma_path, expected_size=10)
+        io.open(OpenMode.OPEN_WRITE)
+        # non-bytes payloads are written through write_zero_copy rather than copied
+        with mock.patch.object(
+            io, "write_zero_copy", wraps=io.write_zero_copy
+        ) as write_zero_copy:
+            self.assertEqual(io.write(memoryview(b"0123456789")), 10)
+        write_zero_copy.assert_called_once()
+        self.assertTrue(self._client.contains(object_id))
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_staging_write(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaIO(object_id, self._plasma_path, use_staging=True)
+        io.open(OpenMode.OPEN_WRITE)
+        for chunk in (b"0123", memoryview(b"456"), b"789"):
+            io.write(chunk)
+        self.assertEqual(io.size(), 10)
+        # staged data reaches the store on close
+        self.assertFalse(self._client.contains(object_id))
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_staging_write_with_expected_size(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaIO(object_id, self._plasma_path, expected_size=10, use_staging=True)
+        io.open(OpenMode.OPEN_WRITE)
+        io.write(b"01234")
+        io.write(b"56789")
+        with self.assertRaises(IOError):
+            io.write(b"0")
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_flight_staging_write(self):
+        object_id = plasma.ObjectID.from_random()
+        io = PlasmaFlightIO(object_id, self._plasma_path, use_staging=True)
+        io.open(OpenMode.OPEN_WRITE)
+        for chunk in (b"0123", memoryview(b"456"), b"789"):
+            io.write(chunk)
+        self.assertEqual(io.size(), 10)
+        io.close()
+        self.assertEqual(self._read_all(object_id), b"0123456789")
+
+    def test_read_slice(self):
+        object_id = self._put(b"0123456789")
+        io = PlasmaIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_READ)
+        self.assertEqual(io.read_slice(2, 3).tobytes(), b"234")
+        self.assertEqual(io.read_slice(8, 5).tobytes(), b"89")
+        # reads advance a cursor over zero-copy slices until an empty view
+        chunks = []
+        while chunk := io.read(4):
+            self.assertIsInstance(chunk, memoryview)
+            chunks.append(chunk.tobytes())
+        self.assertEqual(chunks, [b"0123", b"4567", b"89"])
+        io.close()
+
+    def test_export_c_data_interface(self):
+        ffi = pytest.importorskip("pyarrow.cffi").ffi
+        object_id = self._put(b"0123456789")
+        io = PlasmaFlightIO(object_id, self._plasma_path)
+        io.open(OpenMode.OPEN_READ)
+        c_array = ffi.new("struct ArrowArray*")
+        c_schema = ffi.new("struct ArrowSchema*")
+        array_ptr = int(ffi.cast("uintptr_t", c_array))
+        schema_ptr = int(ffi.cast("uintptr_t", c_schema))
+        io.export_c_data_interface(array_ptr, schema_ptr)
+        plasma_address = pyarrow.py_buffer(io.buffer()).address
+        io.close()
+        # the exported array keeps the plasma buffer alive after the IO closes
+        array = pyarrow.Array._import_from_c(array_ptr, schema_ptr)
+        self.assertEqual(array.type, pyarrow.binary())
+        self.assertEqual(array.to_pylist(), [b"0123456789"])
+        self.assertEqual(array.buffers()[2].address, plasma_address)